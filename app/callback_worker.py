@@ -10,14 +10,19 @@ Handles:
 import asyncio
 import httpx
 import logging
-from datetime import datetime
+import os
+from collections import deque
+from datetime import datetime, timezone
 from typing import Optional
 from urllib.parse import urlparse
 import random
+import time
+
+from cachetools import TTLCache
 
 from app.config import settings, is_private_ip
 from app.models import (
-    AsyncWorkPayload, WorkPayload, WorkResult, 
+    AsyncWorkPayload, WorkResult, 
     RequestRecord, RequestMode, RequestStatus, CallbackPayload
 )
 from app.work import compute_work_async
@@ -31,20 +36,29 @@ class CallbackWorkerPool:
     Manages async request processing and callback delivery.
     
     Design decisions:
-    - Uses asyncio.Queue for backpressure (bounded queue)
+    - Bounded deque for backpressure; workers pop without yielding and
+      park only when it is empty, each enqueue waking a single worker
     - Multiple workers for parallelism
     - Exponential backoff for retry
     - SSRF protection via URL validation
     """
     
     def __init__(self):
-        self.queue: asyncio.Queue = asyncio.Queue(
-            maxsize=settings.async_queue_max_size
-        )
+        # (record, payload, input_hash)
+        self.queue: deque[tuple[RequestRecord, AsyncWorkPayload, Optional[str]]] = deque()
+        # Futures of parked (idle) workers; enqueue wakes one, stop wakes all
+        self._idle: deque[asyncio.Future] = deque()
         self.workers: list[asyncio.Task] = []
         self.running = False
         self.http_client: Optional[httpx.AsyncClient] = None
         self._active_workers = 0
+        # (callback hostname, port) -> (consecutive failed deliveries, open until monotonic time).
+        # Bounded, and a host that hasn't failed for twice the max open window
+        # is forgotten, so dead hosts don't accumulate forever.
+        self._host_breaker: TTLCache = TTLCache(
+            maxsize=settings.callback_breaker_max_hosts,
+            ttl=2 * settings.callback_breaker_max_open_seconds
+        )
     
     async def start(self):
         """Start the worker pool."""
@@ -55,7 +69,12 @@ class CallbackWorkerPool:
         self.http_client = httpx.AsyncClient(
             timeout=settings.callback_timeout_seconds,
             follow_redirects=False,  # Security: don't follow redirects (SSRF)
-            limits=httpx.Limits(max_connections=100)
+            http2=True,  # Multiplex callbacks to the same host over one connection
+            limits=httpx.Limits(
+                max_connections=settings.callback_max_connections,
+                max_keepalive_connections=settings.callback_max_keepalive,
+                keepalive_expiry=settings.callback_keepalive_expiry
+            )
         )
         
         # Start worker tasks
@@ -74,38 +93,68 @@ class CallbackWorkerPool:
             return
         
         self.running = False
+        # One wakeup per parked worker so each sees running=False and exits
+        while self._idle:
+            self._wake_one()
+        
+        # Close HTTP client first so in-flight callbacks fail fast instead
+        # of running out their timeout
+        if self.http_client:
+            await self.http_client.aclose()
+            self.http_client = None
         
         # Cancel all workers
         for worker in self.workers:
             worker.cancel()
         
-        # Wait for workers to finish
-        await asyncio.gather(*self.workers, return_exceptions=True)
+        # Wait for workers to finish, but don't let a stuck one hold up shutdown
+        if self.workers:
+            _, pending = await asyncio.wait(
+                self.workers,
+                timeout=settings.shutdown_grace_seconds
+            )
+            if pending:
+                logger.warning(
+                    f"{len(pending)} callback workers still running after "
+                    f"{settings.shutdown_grace_seconds}s shutdown grace period"
+                )
         self.workers.clear()
         
-        # Close HTTP client
-        if self.http_client:
-            await self.http_client.aclose()
-            self.http_client = None
-        
         logger.info("Callback worker pool stopped")
     
-    async def enqueue(self, request_id: str, payload: AsyncWorkPayload) -> bool:
+    async def enqueue(
+        self,
+        record: RequestRecord,
+        payload: AsyncWorkPayload,
+        input_hash: Optional[str] = None
+    ) -> bool:
         """
         Add async request to queue.
+        record is the already stored request record, carried along so the
+        worker doesn't have to read it back; input_hash is the already
+        computed hash of payload.data, if any.
         Returns False if queue is full (backpressure).
         """
-        try:
-            self.queue.put_nowait((request_id, payload))
-            return True
-        except asyncio.QueueFull:
-            logger.warning(f"Queue full, rejecting request {request_id}")
+        if len(self.queue) >= settings.async_queue_max_size:
+            logger.warning("Queue full, rejecting request %s", record.id)
             return False
+        
+        self.queue.append((record, payload, input_hash))
+        self._wake_one()
+        return True
+    
+    def _wake_one(self):
+        """Wake a single parked worker, if any."""
+        while self._idle:
+            waiter = self._idle.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
     
     def get_stats(self) -> dict:
         """Get queue statistics."""
         return {
-            "queue_size": self.queue.qsize(),
+            "queue_size": len(self.queue),
             "queue_capacity": settings.async_queue_max_size,
             "active_workers": self._active_workers,
             "total_workers": len(self.workers)
@@ -113,83 +162,112 @@ class CallbackWorkerPool:
     
     async def _worker(self, worker_id: int):
         """Worker loop - processes requests from queue."""
-        logger.debug(f"Worker {worker_id} started")
+        logger.debug("Worker %d started", worker_id)
+        rng = random.Random(os.urandom(8))  # Per-worker PRNG for retry jitter
         
         while self.running:
             try:
-                # Get next request (with timeout for graceful shutdown)
-                try:
-                    request_id, payload = await asyncio.wait_for(
-                        self.queue.get(),
-                        timeout=1.0
-                    )
-                except asyncio.TimeoutError:
+                # Park only when there is nothing to do - no polling timeout;
+                # enqueue() wakes exactly one parked worker per job
+                if not self.queue:
+                    waiter = asyncio.get_running_loop().create_future()
+                    self._idle.append(waiter)
+                    await waiter
                     continue
                 
+                record, payload, input_hash = self.queue.popleft()
+                
                 self._active_workers += 1
                 try:
-                    await self._process_request(request_id, payload)
+                    await self._process_request(record, payload, input_hash, rng)
                 finally:
                     self._active_workers -= 1
-                    self.queue.task_done()
                     
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.exception(f"Worker {worker_id} error: {e}")
+                logger.exception("Worker %d error: %s", worker_id, e)
         
-        logger.debug(f"Worker {worker_id} stopped")
+        logger.debug("Worker %d stopped", worker_id)
     
-    async def _process_request(self, request_id: str, payload: AsyncWorkPayload):
+    async def _process_request(
+        self,
+        record: RequestRecord,
+        payload: AsyncWorkPayload,
+        input_hash: Optional[str],
+        rng: random.Random
+    ):
         """Process a single async request."""
-        logger.debug(f"Processing async request {request_id}")
-        
-        # Update status to processing
-        record = await database.get_request(request_id)
-        if record:
-            record.status = RequestStatus.PROCESSING
-            await database.save_request(record)
+        request_id = record.id
+        logger.debug("Processing async request %s", request_id)
         
+        # No separate PROCESSING write - the record stays PENDING until the
+        # result is stored, saving a commit per job
         try:
-            # Perform the work
-            work_payload = WorkPayload(
-                data=payload.data,
-                iterations=payload.iterations
-            )
-            result = await compute_work_async(request_id, work_payload)
+            # Perform the work (AsyncWorkPayload is a WorkPayload, so it is
+            # passed as-is rather than re-validated and re-encoded)
+            result = await compute_work_async(request_id, payload, input_hash)
             
             # Update status
-            if record:
-                record.status = RequestStatus.CALLBACK_PENDING
-                record.result = result
-                record.completed_at = datetime.utcnow()
-                await database.save_request(record)
+            record.status = RequestStatus.CALLBACK_PENDING
+            record.result = result
+            record.completed_at = datetime.now(timezone.utc)
+            await database.update_request_status(
+                request_id,
+                batched=True,
+                status=record.status,
+                result=record.result,
+                completed_at=record.completed_at
+            )
             
             # Deliver callback
-            await self._deliver_callback(request_id, payload.callback_url, result)
+            await self._deliver_callback(request_id, payload.callback_url, result, rng)
             
         except Exception as e:
-            logger.exception(f"Error processing request {request_id}: {e}")
-            if record:
-                record.status = RequestStatus.CALLBACK_FAILED
-                record.callback_last_error = str(e)
-                await database.save_request(record)
+            logger.exception("Error processing request %s: %s", request_id, e)
+            await database.update_request_status(
+                request_id,
+                batched=True,
+                status=RequestStatus.CALLBACK_FAILED,
+                callback_last_error=str(e)
+            )
     
     async def _deliver_callback(
         self, 
         request_id: str, 
         callback_url: str, 
-        result: WorkResult
+        result: WorkResult,
+        rng: random.Random
     ):
         """Deliver result to callback URL with retry."""
         
         # Validate callback URL (SSRF protection)
-        if not self._is_safe_callback_url(callback_url):
-            logger.warning(f"Blocked unsafe callback URL for {request_id}: {callback_url}")
-            await self._update_callback_status(
-                request_id, 
-                success=False,
-                error="Callback URL blocked by security policy"
+        host = await self._validate_callback_url(callback_url)
+        if host is None:
+            logger.warning(
+                "Blocked unsafe callback URL for %s: %s", request_id, callback_url
+            )
+            await database.update_callback_state(
+                request_id,
+                status=RequestStatus.CALLBACK_FAILED,
+                error="Callback URL blocked by security policy",
+                batched=True
+            )
+            return
+        
+        # Fail fast while the host's circuit is open (recent deliveries
+        # exhausted their retries) instead of tying up a worker on retries.
+        # Circuits are keyed by (lowercased hostname, port).
+        _, open_until = self._host_breaker.get(host, (0, 0.0))
+        if time.monotonic() < open_until:
+            logger.warning(
+                "Callback host %s:%d circuit open, failing %s fast", *host, request_id
+            )
+            await database.update_callback_state(
+                request_id,
+                status=RequestStatus.CALLBACK_FAILED,
+                error="Callback host unavailable (circuit open)",
+                batched=True
             )
             return
         
@@ -198,66 +276,90 @@ class CallbackWorkerPool:
             request_id=request_id,
             status="success",
             result=result,
-            timestamp=datetime.utcnow()
+            timestamp=datetime.now(timezone.utc)
         )
         
+        # Serialize once - the body is identical across attempts
+        body = callback_payload.model_dump_json().encode()
+        headers = {
+            "Content-Type": "application/json",
+            "X-Request-ID": request_id,
+            "X-Attempt": "1"
+        }
+        
         # Retry loop with exponential backoff
         last_error = None
         for attempt in range(settings.callback_max_retries + 1):
+            headers["X-Attempt"] = str(attempt + 1)
             try:
                 response = await self.http_client.post(
                     callback_url,
-                    json=callback_payload.model_dump(mode='json'),
-                    headers={
-                        "Content-Type": "application/json",
-                        "X-Request-ID": request_id,
-                        "X-Attempt": str(attempt + 1)
-                    }
+                    content=body,
+                    headers=headers
                 )
                 
                 # Accept any 2xx response as success
                 if 200 <= response.status_code < 300:
-                    logger.info(f"Callback delivered for {request_id}")
-                    await self._update_callback_status(request_id, success=True)
+                    logger.info("Callback delivered for %s", request_id)
+                    self._host_breaker.pop(host, None)
+                    await database.update_callback_state(
+                        request_id,
+                        status=RequestStatus.CALLBACK_SUCCESS,
+                        batched=True
+                    )
                     return
                 else:
                     last_error = f"HTTP {response.status_code}"
                     logger.warning(
-                        f"Callback failed for {request_id} (attempt {attempt + 1}): {last_error}"
+                        "Callback failed for %s (attempt %d): %s",
+                        request_id, attempt + 1, last_error
                     )
                     
             except httpx.TimeoutException:
                 last_error = "Timeout"
                 logger.warning(
-                    f"Callback timeout for {request_id} (attempt {attempt + 1})"
+                    "Callback timeout for %s (attempt %d)", request_id, attempt + 1
                 )
             except httpx.RequestError as e:
                 last_error = str(e)
                 logger.warning(
-                    f"Callback error for {request_id} (attempt {attempt + 1}): {e}"
+                    "Callback error for %s (attempt %d): %s", request_id, attempt + 1, e
                 )
             
-            # Update attempt count
-            await self._increment_callback_attempt(request_id, last_error)
-            
             # Exponential backoff with jitter
             if attempt < settings.callback_max_retries:
+                # Update attempt count
+                await database.update_callback_state(
+                    request_id, error=last_error, attempts=1, batched=True
+                )
+                
                 delay = min(
                     settings.callback_retry_base_delay * (2 ** attempt),
                     settings.callback_retry_max_delay
                 )
-                delay *= (0.5 + random.random())  # Add jitter
+                delay *= (0.5 + rng.random())  # Add jitter
                 await asyncio.sleep(delay)
         
-        # All retries exhausted
-        logger.error(f"Callback permanently failed for {request_id}: {last_error}")
-        await self._update_callback_status(
-            request_id, 
-            success=False, 
-            error=f"Max retries exceeded: {last_error}"
+        # All retries exhausted - open the host's circuit, backing off
+        # exponentially while it keeps failing. Re-read the count: other
+        # deliveries to this host may have failed during our retries.
+        fail_count = self._host_breaker.get(host, (0, 0.0))[0] + 1
+        self._host_breaker[host] = (
+            fail_count,
+            time.monotonic() + min(settings.callback_breaker_max_open_seconds, 2 ** fail_count)
+        )
+        
+        # The final attempt is counted in the same write
+        logger.error("Callback permanently failed for %s: %s", request_id, last_error)
+        await database.update_callback_state(
+            request_id,
+            status=RequestStatus.CALLBACK_FAILED,
+            error=f"Max retries exceeded: {last_error}",
+            attempts=1,
+            batched=True
         )
     
-    def _is_safe_callback_url(self, url: str) -> bool:
+    async def _validate_callback_url(self, url: str) -> Optional[tuple[str, int]]:
         """
         Validate callback URL is safe (SSRF protection).
         
@@ -265,59 +367,46 @@ class CallbackWorkerPool:
         - Non-HTTP(S) schemes
         - Private/internal IP addresses
         - Localhost variants
+        
+        DNS verdicts are cached per hostname (see is_private_ip).
+        Returns the URL's (hostname, port), or None if it is blocked.
         """
         try:
-            parsed = urlparse(url)
+            host = self._parse_and_validate_scheme_host(url)
+            if host is None:
+                return None
             
-            # Check scheme
-            if parsed.scheme not in settings.callback_allowed_schemes:
-                return False
+            # Block private IP ranges (verdicts are cached per hostname)
+            if settings.callback_block_private_ips and await is_private_ip(host[0]):
+                return None
             
-            # Check for private IPs if enabled
-            if settings.callback_block_private_ips:
-                hostname = parsed.hostname or ""
-                
-                # Block localhost variants
-                if hostname.lower() in ('localhost', '127.0.0.1', '::1', '0.0.0.0'):
-                    return False
-                
-                # Block private IP ranges
-                if is_private_ip(hostname):
-                    return False
-            
-            return True
+            return host
             
         except Exception:
-            return False
+            return None
     
-    async def _update_callback_status(
-        self, 
-        request_id: str, 
-        success: bool, 
-        error: Optional[str] = None
-    ):
-        """Update request status after callback attempt."""
-        record = await database.get_request(request_id)
-        if record:
-            record.status = (
-                RequestStatus.CALLBACK_SUCCESS if success 
-                else RequestStatus.CALLBACK_FAILED
-            )
-            if error:
-                record.callback_last_error = error
-            await database.save_request(record)
-    
-    async def _increment_callback_attempt(
-        self, 
-        request_id: str, 
-        error: str
-    ):
-        """Increment callback attempt counter."""
-        record = await database.get_request(request_id)
-        if record:
-            record.callback_attempts += 1
-            record.callback_last_error = error
-            await database.save_request(record)
+    def _parse_and_validate_scheme_host(self, url: str) -> Optional[tuple[str, int]]:
+        """
+        Cheap, DNS-free checks. Returns (lowercased hostname, port - the
+        scheme's default if omitted), or None if blocked.
+        """
+        parsed = urlparse(url)
+        
+        # Check scheme
+        if parsed.scheme not in settings.callback_allowed_schemes:
+            return None
+        
+        hostname = (parsed.hostname or "").lower()
+        
+        # Block localhost variants
+        if settings.callback_block_private_ips and (
+            hostname in ('localhost', '127.0.0.1', '::1', '0.0.0.0')
+        ):
+            return None
+        
+        # .port raises ValueError for an invalid port
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        return hostname, port
 
 
 # Global worker pool instance
@@ -2,8 +2,13 @@
 Configuration with sensible defaults and environment overrides.
 """
 from pydantic_settings import BaseSettings                 #1
-from typing import Set                  #2
+from typing import Literal, Optional, Set                  #2
+import asyncio
 import ipaddress
+import socket
+
+import aiodns
+from cachetools import TTLCache
                   
 
 class Settings(BaseSettings):
@@ -13,20 +18,30 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite+aiosqlite:///./requests.db"                    #3
+    db_batch_max_size: int = 64  # Max records committed per write batch
+    db_batch_max_delay_ms: float = 2.0  # How long a batch waits for more writes
     
     # Async worker settings
     async_worker_count: int = 10  # Number of concurrent callback workers
     async_queue_max_size: int = 10000  # Max pending async jobs
+    shutdown_grace_seconds: float = 5.0  # Max wait for workers on shutdown
     
     # Callback settings
     callback_timeout_seconds: float = 10.0
     callback_max_retries: int = 3
     callback_retry_base_delay: float = 1.0  # Exponential backoff base                 #4
     callback_retry_max_delay: float = 30.0
+    callback_max_connections: int = 1000  # HTTP client connection cap
+    callback_max_keepalive: int = 100  # Idle connections kept for reuse
+    callback_keepalive_expiry: float = 30.0
+    callback_breaker_max_open_seconds: float = 60.0  # Max fail-fast window per host
+    callback_breaker_max_hosts: int = 10000  # Failing hosts tracked by the breaker
     
     # SSRF protection - block internal/private IPs
     callback_block_private_ips: bool = True
     callback_allowed_schemes: Set[str] = {"http", "https"}
+    callback_dns_cache_size: int = 4096  # Hostnames with a cached SSRF verdict
+    callback_dns_cache_ttl_seconds: float = 300.0
     
     # Request storage limits (prevent unbounded growth)
     max_stored_requests: int = 100000
@@ -34,6 +49,13 @@ class Settings(BaseSettings):
     
     # Work simulation
     work_duration_seconds: float = 0.1  # Simulated work duration
+    # "hex_chain" keeps the original output hashes; "binary_chain" and
+    # "single_buffer" (one GIL-releasing hash per request) are faster but
+    # produce different ones
+    work_hash_mode: Literal["hex_chain", "binary_chain", "single_buffer"] = "hex_chain"
+    work_process_pool: bool = True  # Run work in a process pool (thread pool if False)
+    work_process_workers: int = 0  # Process pool size; 0 = os.cpu_count()
+    work_cache_size: int = 10000  # Memoized work results per process; 0 disables
     
     class Config:
         env_prefix = "APP_"
@@ -42,22 +64,113 @@ class Settings(BaseSettings):
 settings = Settings()
 
 
-def is_private_ip(hostname: str) -> bool:
-    """Check if hostname resolves to a private/internal IP (SSRF protection)."""
+# hostname -> "resolves to a private IP" verdict
+_dns_cache: TTLCache = TTLCache(
+    maxsize=settings.callback_dns_cache_size,
+    ttl=settings.callback_dns_cache_ttl_seconds
+)
+
+
+_resolver: Optional[aiodns.DNSResolver] = None
+
+
+def _get_resolver() -> aiodns.DNSResolver:
+    """c-ares resolver for the running loop (created lazily, not at import)."""
+    global _resolver
+    loop = asyncio.get_running_loop()
+    if _resolver is None or _resolver.loop is not loop:
+        _resolver = aiodns.DNSResolver(loop=loop)
+    return _resolver
+
+
+async def is_private_ip(hostname: str) -> bool:
+    """
+    Check if hostname resolves to a private/internal IP (SSRF protection).
+    
+    Lookups go through c-ares (aiodns), so concurrent checks don't queue
+    on the thread pool, and verdicts are cached per hostname for
+    callback_dns_cache_ttl_seconds.
+    """
+    hostname = hostname.lower()
+    blocked = _dns_cache.get(hostname)
+    if blocked is None:
+        blocked = await _resolves_to_private_ip(hostname)
+        if blocked is None:
+            # If we can't resolve, block it to be safe - but don't cache
+            # what may be a transient DNS failure
+            return True
+        _dns_cache[hostname] = blocked
+    return blocked
+
+
+async def _resolves_to_private_ip(hostname: str) -> Optional[bool]:
+    """Verdict for hostname, or None if it couldn't be resolved."""
+    if not hostname:
+        return True
+    
     try:
-        import socket
-        # Resolve hostname to IP
-        ip_str = socket.gethostbyname(hostname)
-        ip = ipaddress.ip_address(ip_str)
-        
-        # Block private, loopback, link-local, reserved ranges
-        return (
-            ip.is_private or
-            ip.is_loopback or
-            ip.is_link_local or
-            ip.is_reserved or
-            ip.is_multicast
+        # IP literals don't need a DNS round-trip
+        addresses = [ipaddress.ip_address(hostname.strip("[]"))]
+    except ValueError:
+        try:
+            addresses = await _resolve(hostname)
+        except (socket.gaierror, UnicodeError, ValueError):
+            return None
+    
+    if not addresses:
+        return None
+    
+    # Block private, loopback, link-local, reserved ranges
+    return any(
+        ip.is_private or
+        ip.is_loopback or
+        ip.is_link_local or
+        ip.is_reserved or
+        ip.is_multicast
+        for ip in addresses
+    )
+
+
+# c-ares errors meaning "no records of this family", not a lookup failure
+_NO_RECORDS_ERRORS = (aiodns.error.ARES_ENODATA, aiodns.error.ARES_ENOTFOUND)
+
+
+async def _resolve(hostname: str) -> list:
+    """
+    Resolve both A and AAAA records via c-ares - the HTTP client may connect
+    over either family, so every address must be checked.
+    
+    Falls back to getaddrinfo when c-ares itself fails (a broken resolver
+    must not turn every callback host into a blocked one).
+    """
+    addresses = await _resolve_with_cares(hostname)
+    if addresses:
+        return addresses
+    
+    infos = await asyncio.get_running_loop().getaddrinfo(
+        hostname, None, type=socket.SOCK_STREAM
+    )
+    return [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+
+
+async def _resolve_with_cares(hostname: str) -> Optional[list]:
+    """A + AAAA addresses via c-ares, or None if either lookup failed."""
+    try:
+        resolver = _get_resolver()
+        results = await asyncio.gather(
+            resolver.gethostbyname(hostname, socket.AF_INET),
+            resolver.gethostbyname(hostname, socket.AF_INET6),
+            return_exceptions=True
         )
-    except (socket.gaierror, ValueError):
-        # If we can't resolve, block it to be safe
-        return True
+    except Exception:
+        return None
+    
+    addresses = []
+    for result in results:
+        if isinstance(result, aiodns.error.DNSError) and result.args[0] in _NO_RECORDS_ERRORS:
+            continue  # The host just has no records of this family
+        if isinstance(result, BaseException):
+            # A failed lookup could hide a private address of that family
+            return None
+        addresses.extend(ipaddress.ip_address(addr) for addr in result.addresses)
+    return addresses
@@ -2,11 +2,15 @@
 SQLite persistence layer for request tracking.
 Uses aiosqlite for async database operations.
 """
+import asyncio
 import aiosqlite
 import json
-from datetime import datetime, timedelta
+import orjson
+import time
+from datetime import datetime, timezone
 from typing import Optional, List
 from contextlib import asynccontextmanager
+from functools import lru_cache
 
 from app.models import (
     RequestRecord, RequestMode, RequestStatus, WorkResult
@@ -16,24 +20,51 @@ from app.config import settings
 
 DATABASE_PATH = "requests.db"
 
+# Applied once when the shared connection is opened
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",
+)
+
+# Shared connection, opened in init_database() and closed in close_database().
+# aiosqlite runs every statement on one background thread; the lock keeps
+# multi-statement operations (execute + commit) from interleaving.
+_conn: Optional[aiosqlite.Connection] = None
+_lock: Optional[asyncio.Lock] = None
+
+# Timestamps are stored as INTEGER unix epoch milliseconds (UTC)
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS requests (
+        id TEXT PRIMARY KEY,
+        mode TEXT NOT NULL,
+        status TEXT NOT NULL,
+        payload_hash TEXT NOT NULL,
+        created_at INTEGER NOT NULL,
+        completed_at INTEGER,
+        callback_url TEXT,
+        callback_attempts INTEGER DEFAULT 0,
+        callback_last_error TEXT,
+        result_json TEXT
+    )
+"""
+
 
 async def init_database():
-    """Initialize database schema."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS requests (
-                id TEXT PRIMARY KEY,
-                mode TEXT NOT NULL,
-                status TEXT NOT NULL,
-                payload_hash TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                completed_at TEXT,
-                callback_url TEXT,
-                callback_attempts INTEGER DEFAULT 0,
-                callback_last_error TEXT,
-                result_json TEXT
-            )
-        """)
+    """Open the shared connection and initialize database schema."""
+    global _conn, _lock
+    if _conn is None:
+        _conn = await aiosqlite.connect(DATABASE_PATH)
+        _conn.row_factory = aiosqlite.Row
+        for pragma in CONNECTION_PRAGMAS:
+            await _conn.execute(pragma)
+        _lock = asyncio.Lock()
+        _batcher.start()
+    
+    async with _connection() as db:
+        await db.execute(_CREATE_TABLE_SQL)
+        await _migrate_text_timestamps(db)
         
         # Index for efficient queries
         await db.execute("""
@@ -52,35 +83,278 @@ async def init_database():
         await db.commit()
 
 
-async def save_request(record: RequestRecord) -> None:
-    """Save or update a request record."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        result_json = record.result.model_dump_json() if record.result else None
-        
-        await db.execute("""
-            INSERT OR REPLACE INTO requests 
-            (id, mode, status, payload_hash, created_at, completed_at, 
-             callback_url, callback_attempts, callback_last_error, result_json)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            record.id,
-            record.mode.value,
-            record.status.value,
-            record.payload_hash,
-            record.created_at.isoformat(),
-            record.completed_at.isoformat() if record.completed_at else None,
-            record.callback_url,
-            record.callback_attempts,
-            record.callback_last_error,
-            result_json
-        ))
+async def _migrate_text_timestamps(db: aiosqlite.Connection):
+    """
+    Rebuild a requests table created with ISO-8601 TEXT timestamps.
+    
+    Also finishes a copy left over by an interrupted run of an earlier,
+    non-atomic version of this migration.
+    """
+    async with db.execute("PRAGMA table_info(requests)") as cursor:
+        column_types = {row["name"]: row["type"] for row in await cursor.fetchall()}
+    async with db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'requests_text_timestamps'"
+    ) as cursor:
+        leftover = await cursor.fetchone() is not None
+    if column_types.get("created_at", "").upper() != "TEXT" and not leftover:
+        return
+    
+    # sqlite3 only opens a transaction implicitly before DML, so without an
+    # explicit one the rename and create would each commit on their own.
+    # SQLite DDL is transactional: a failure anywhere rolls everything back
+    # (_connection() rolls back on exception).
+    await db.execute("BEGIN")
+    if not leftover:
+        # Column affinity can't be altered in place, so copy into a fresh
+        # table. The old indexes go with the old table and are recreated
+        # afterwards.
+        await db.execute("ALTER TABLE requests RENAME TO requests_text_timestamps")
+        await db.execute(_CREATE_TABLE_SQL)
+    await db.execute("""
+        INSERT OR IGNORE INTO requests
+        SELECT id, mode, status, payload_hash,
+               CAST(ROUND((julianday(created_at) - 2440587.5) * 86400000) AS INTEGER),
+               CAST(ROUND((julianday(completed_at) - 2440587.5) * 86400000) AS INTEGER),
+               callback_url, callback_attempts, callback_last_error, result_json
+        FROM requests_text_timestamps
+    """)
+    await db.execute("DROP TABLE requests_text_timestamps")
+    await db.commit()
+
+
+def _to_epoch_ms(dt: Optional[datetime]) -> Optional[int]:
+    """datetime -> epoch milliseconds; naive datetimes are taken as UTC."""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def _from_epoch_ms(ms: Optional[int]) -> Optional[datetime]:
+    """Epoch milliseconds -> UTC datetime."""
+    if ms is None:
+        return None
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+async def close_database():
+    """Close the shared connection (called on shutdown)."""
+    global _conn, _lock
+    await _batcher.stop()
+    if _conn is not None:
+        await _conn.close()
+        _conn = None
+        _lock = None
+
+
+@asynccontextmanager
+async def _connection():
+    """Serialize access to the shared connection."""
+    if _conn is None:
+        raise RuntimeError("Database not initialized - call init_database() first")
+    async with _lock:
+        try:
+            yield _conn
+        except Exception:
+            # Don't leave a half-written transaction on the shared connection
+            if _conn.in_transaction:
+                await _conn.rollback()
+            raise
+
+
+# Statements live at module scope so sqlite3's statement cache reuses
+# their prepared plans across calls.
+_INSERT_SQL = """
+    INSERT INTO requests 
+    (id, mode, status, payload_hash, created_at, completed_at, 
+     callback_url, callback_attempts, callback_last_error, result_json)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# NULL status/error leave the stored value unchanged
+_CALLBACK_STATE_SQL = """
+    UPDATE requests
+    SET status = COALESCE(?, status),
+        callback_last_error = COALESCE(?, callback_last_error),
+        callback_attempts = callback_attempts + ?
+    WHERE id = ?
+"""
+
+# RequestRecord field -> (column, value converter) for partial updates
+_UPDATE_COLUMNS = {
+    "status": ("status", lambda v: v.value),
+    "completed_at": ("completed_at", _to_epoch_ms),
+    "callback_attempts": ("callback_attempts", lambda v: v),
+    "callback_last_error": ("callback_last_error", lambda v: v),
+    "result": ("result_json", lambda v: v.model_dump_json() if v else None),
+}
+
+
+@lru_cache(maxsize=None)
+def _update_sql(fields: tuple[str, ...]) -> str:
+    """UPDATE statement touching only the given fields (cached per field set)."""
+    assignments = ", ".join(f"{_UPDATE_COLUMNS[f][0]} = ?" for f in fields)
+    return f"UPDATE requests SET {assignments} WHERE id = ?"
+
+
+async def insert_request(record: RequestRecord) -> None:
+    """Insert a new request record."""
+    await _execute(_INSERT_SQL, (
+        record.id,
+        record.mode.value,
+        record.status.value,
+        record.payload_hash,
+        _to_epoch_ms(record.created_at),
+        _to_epoch_ms(record.completed_at),
+        record.callback_url,
+        record.callback_attempts,
+        record.callback_last_error,
+        record.result.model_dump_json() if record.result else None
+    ))
+
+
+async def update_request_status(
+    request_id: str,
+    batched: bool = False,
+    **fields
+) -> None:
+    """
+    Update selected columns of an existing request.
+    
+    Accepts status, completed_at, callback_attempts, callback_last_error
+    and result. With batched=True the write goes through the write batcher
+    and shares a transaction with concurrent writers.
+    """
+    unknown = fields.keys() - _UPDATE_COLUMNS.keys()
+    if unknown:
+        raise ValueError(f"Cannot update fields: {sorted(unknown)}")
+    
+    names = tuple(fields)
+    params = [_UPDATE_COLUMNS[name][1](fields[name]) for name in names]
+    params.append(request_id)
+    await _execute(_update_sql(names), tuple(params), batched)
+
+
+async def update_callback_state(
+    request_id: str,
+    status: Optional[RequestStatus] = None,
+    error: Optional[str] = None,
+    attempts: int = 0,
+    batched: bool = False
+) -> None:
+    """
+    Record a callback outcome in one statement.
+    
+    Sets status and/or last error (None keeps the stored value) and adds
+    `attempts` to the attempt counter, without reading the row first.
+    """
+    await _execute(
+        _CALLBACK_STATE_SQL,
+        (status.value if status else None, error, attempts, request_id),
+        batched
+    )
+
+
+async def _execute(sql: str, params: tuple, batched: bool = False) -> None:
+    """Run a single write, through the batcher if requested and running."""
+    if batched and _batcher.running:
+        await _batcher.submit(sql, params)
+        return
+    async with _connection() as db:
+        await db.execute(sql, params)
         await db.commit()
 
 
+async def _execute_batch(statements: List[tuple[str, tuple]]) -> None:
+    """Run several writes in a single transaction."""
+    async with _connection() as db:
+        for sql, params in statements:
+            await db.execute(sql, params)
+        await db.commit()
+
+
+class _WriteBatcher:
+    """
+    Delayed-batching coordinator for writes.
+    
+    Callers enqueue (sql, params, future) items; a single flusher task
+    waits up to max_delay for siblings, commits up to max_size statements
+    in one transaction, then resolves every caller's future.
+    """
+    
+    def __init__(self, max_size: int, max_delay: float):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+    
+    def start(self):
+        """Start the flusher task."""
+        if self._task is not None:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name="db-write-batcher")
+    
+    async def stop(self):
+        """Flush pending writes and stop the flusher task."""
+        if self._task is None:
+            return
+        self._closing = True  # New writes bypass the batcher from here on
+        self._queue.put_nowait(None)  # Sentinel: flush and exit
+        await self._task
+        self._task = None
+        self._queue = None
+    
+    async def submit(self, sql: str, params: tuple) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((sql, params, future))
+        await future
+    
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            
+            # Give concurrent writers a moment to join this batch
+            if batch[0] is not None and self._queue.qsize() < self.max_size - 1:
+                await asyncio.sleep(self.max_delay)
+            while len(batch) < self.max_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            
+            stopping = None in batch
+            await self._flush([item for item in batch if item is not None])
+    
+    async def _flush(self, batch: list[tuple[str, tuple, asyncio.Future]]):
+        if not batch:
+            return
+        try:
+            await _execute_batch([(sql, params) for sql, params, _ in batch])
+        except Exception as e:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+
+_batcher = _WriteBatcher(
+    max_size=settings.db_batch_max_size,
+    max_delay=settings.db_batch_max_delay_ms / 1000
+)
+
+
 async def get_request(request_id: str) -> Optional[RequestRecord]:
     """Get a single request by ID."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _connection() as db:
         async with db.execute(
             "SELECT * FROM requests WHERE id = ?", (request_id,)
         ) as cursor:
@@ -90,15 +364,25 @@ async def get_request(request_id: str) -> Optional[RequestRecord]:
     return None
 
 
+# Columns served by GET /requests (everything RequestRecord exposes)
+_LIST_COLUMNS = """
+    id, mode, status, payload_hash, created_at, completed_at,
+    callback_url, callback_attempts, callback_last_error, result_json
+"""
+
+
 async def list_requests(
     mode: Optional[RequestMode] = None,
     limit: int = 100,
     offset: int = 0
-) -> tuple[int, List[RequestRecord]]:
-    """List requests with optional mode filter."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        
+) -> tuple[int, List[dict]]:
+    """
+    List requests with optional mode filter.
+    
+    Returns plain dicts shaped like RequestRecord rather than models -
+    listings can be large and the rows come from our own writes.
+    """
+    async with _connection() as db:
         # Build query
         where_clause = ""
         params: list = []
@@ -116,7 +400,7 @@ async def list_requests(
         
         # Get paginated results
         query = f"""
-            SELECT * FROM requests {where_clause}
+            SELECT {_LIST_COLUMNS} FROM requests {where_clause}
             ORDER BY created_at DESC
             LIMIT ? OFFSET ?
         """
@@ -124,19 +408,19 @@ async def list_requests(
         
         async with db.execute(query, params) as cursor:
             rows = await cursor.fetchall()
-            records = [_row_to_record(row) for row in rows]
+            records = [_row_to_dict(row) for row in rows]
         
         return total, records
 
 
 async def cleanup_old_requests() -> int:
     """Delete requests older than retention period. Returns count deleted."""
-    cutoff = datetime.utcnow() - timedelta(hours=settings.request_retention_hours)
+    cutoff_ms = int(time.time() * 1000) - settings.request_retention_hours * 3_600_000
     
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _connection() as db:
         cursor = await db.execute(
             "DELETE FROM requests WHERE created_at < ?",
-            (cutoff.isoformat(),)
+            (cutoff_ms,)
         )
         deleted = cursor.rowcount
         await db.commit()
@@ -146,7 +430,7 @@ async def cleanup_old_requests() -> int:
 async def check_database_health() -> bool:
     """Quick database health check."""
     try:
-        async with aiosqlite.connect(DATABASE_PATH) as db:
+        async with _connection() as db:
             async with db.execute("SELECT 1") as cursor:
                 await cursor.fetchone()
         return True
@@ -155,20 +439,45 @@ async def check_database_health() -> bool:
 
 
 def _row_to_record(row) -> RequestRecord:
-    """Convert database row to RequestRecord."""
+    """
+    Convert database row to RequestRecord.
+    
+    Uses model_construct() to skip validation - rows only ever come from
+    our own validated writes.
+    """
     result = None
     if row["result_json"]:
-        result = WorkResult.model_validate_json(row["result_json"])
+        result = WorkResult.model_construct(**orjson.loads(row["result_json"]))
     
-    return RequestRecord(
+    return RequestRecord.model_construct(
         id=row["id"],
         mode=RequestMode(row["mode"]),
         status=RequestStatus(row["status"]),
         payload_hash=row["payload_hash"],
-        created_at=datetime.fromisoformat(row["created_at"]),
-        completed_at=datetime.fromisoformat(row["completed_at"]) if row["completed_at"] else None,
+        created_at=_from_epoch_ms(row["created_at"]),
+        completed_at=_from_epoch_ms(row["completed_at"]),
         callback_url=row["callback_url"],
         callback_attempts=row["callback_attempts"],
         callback_last_error=row["callback_last_error"],
         result=result
     )
+
+
+def _row_to_dict(row) -> dict:
+    """
+    Convert database row to a dict matching RequestRecord.
+    
+    Timestamps stay datetimes; ORJSONResponse formats them natively.
+    """
+    return {
+        "id": row["id"],
+        "mode": row["mode"],
+        "status": row["status"],
+        "payload_hash": row["payload_hash"],
+        "created_at": _from_epoch_ms(row["created_at"]),
+        "completed_at": _from_epoch_ms(row["completed_at"]),
+        "callback_url": row["callback_url"],
+        "callback_attempts": row["callback_attempts"],
+        "callback_last_error": row["callback_last_error"],
+        "result": orjson.loads(row["result_json"]) if row["result_json"] else None
+    }
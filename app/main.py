@@ -1,15 +1,14 @@
 """
 Main FastAPI application with all endpoints.
 """
-import hashlib
 import logging
 import uuid
 from contextlib import asynccontextmanager
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
 
 from fastapi import FastAPI, HTTPException, Query, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 from app import database
 from app.callback_worker import worker_pool
@@ -26,7 +25,8 @@ from app.models import (
     SyncResponse,
     WorkPayload,
 )
-from app.work import compute_work_async
+from app import work
+from app.work import compute_work_async, hash_input_async
 
 # Configure logging
 logging.basicConfig(
@@ -41,6 +41,9 @@ async def lifespan(app: FastAPI):
     """Application lifespan - startup and shutdown."""
     # Startup
     logger.info("Starting up...")
+    # Spawn the work processes before the database thread and batcher task
+    # exist, so no worker is forked from a multi-threaded process
+    await work.start_executor()
     await database.init_database()
     await worker_pool.start()
     
@@ -49,12 +52,15 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down...")
     await worker_pool.stop()
+    work.shutdown_executor()
+    await database.close_database()
 
 
 app = FastAPI(
     title="Sync vs Async API",
     description="Backend demonstrating sync and async (callback) request patterns",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -88,35 +94,40 @@ async def sync_endpoint(payload: WorkPayload):
     Performs work and returns result inline.
     Suitable for quick operations or when caller can wait.
     """
-    request_id = str(uuid.uuid4())
+    request_id = uuid.uuid4().hex
+    input_hash = await hash_input_async(payload.data_bytes)
     
     # Create request record
     record = RequestRecord(
         id=request_id,
         mode=RequestMode.SYNC,
         status=RequestStatus.PROCESSING,
-        payload_hash=hashlib.sha256(payload.data.encode()).hexdigest()[:16],
-        created_at=datetime.utcnow()
+        payload_hash=input_hash[:16],
+        created_at=datetime.now(timezone.utc)
     )
-    await database.save_request(record)
+    await database.insert_request(record)
     
     try:
         # Perform the work
-        result = await compute_work_async(request_id, payload)
+        result = await compute_work_async(request_id, payload, input_hash)
         
         # Update record with result
-        record.status = RequestStatus.COMPLETED
-        record.completed_at = datetime.utcnow()
-        record.result = result
-        await database.save_request(record)
+        await database.update_request_status(
+            request_id,
+            status=RequestStatus.COMPLETED,
+            completed_at=datetime.now(timezone.utc),
+            result=result
+        )
         
         return SyncResponse(result=result)
         
     except Exception as e:
         logger.exception(f"Sync request {request_id} failed: {e}")
-        record.status = RequestStatus.CALLBACK_FAILED  # Reusing status for error
-        record.callback_last_error = str(e)
-        await database.save_request(record)
+        await database.update_request_status(
+            request_id,
+            status=RequestStatus.CALLBACK_FAILED,  # Reusing status for error
+            callback_last_error=str(e)
+        )
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -130,27 +141,30 @@ async def async_endpoint(payload: AsyncWorkPayload):
     
     Suitable for long-running operations or when caller shouldn't block.
     """
-    request_id = str(uuid.uuid4())
+    request_id = uuid.uuid4().hex
+    input_hash = await hash_input_async(payload.data_bytes)
     
     # Create request record
     record = RequestRecord(
         id=request_id,
         mode=RequestMode.ASYNC,
         status=RequestStatus.PENDING,
-        payload_hash=hashlib.sha256(payload.data.encode()).hexdigest()[:16],
-        created_at=datetime.utcnow(),
+        payload_hash=input_hash[:16],
+        created_at=datetime.now(timezone.utc),
         callback_url=payload.callback_url
     )
-    await database.save_request(record)
+    await database.insert_request(record)
     
     # Enqueue for background processing
-    success = await worker_pool.enqueue(request_id, payload)
+    success = await worker_pool.enqueue(record, payload, input_hash)
     
     if not success:
         # Queue is full - reject with 503
-        record.status = RequestStatus.CALLBACK_FAILED
-        record.callback_last_error = "Server overloaded - queue full"
-        await database.save_request(record)
+        await database.update_request_status(
+            request_id,
+            status=RequestStatus.CALLBACK_FAILED,
+            callback_last_error="Server overloaded - queue full"
+        )
         raise HTTPException(
             status_code=503,
             detail="Server overloaded, please retry later"
@@ -177,7 +191,8 @@ async def list_requests(
     - Auditing
     """
     total, requests = await database.list_requests(mode, limit, offset)
-    return RequestListResponse(total=total, requests=requests)
+    # Rows are already JSON-shaped; skip response_model validation
+    return ORJSONResponse({"total": total, "requests": requests})
 
 
 @app.get("/requests/{request_id}", response_model=RequestRecord)
@@ -193,7 +208,8 @@ async def get_request(request_id: str):
     record = await database.get_request(request_id)
     if not record:
         raise HTTPException(status_code=404, detail="Request not found")
-    return record
+    # Serialized by orjson like GET /requests, so timestamps format identically
+    return ORJSONResponse(record.model_dump())
 
 
 @app.get("/healthz", response_model=HealthResponse)
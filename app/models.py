@@ -1,7 +1,7 @@
 """
 Pydantic models for request/response validation.
 """
-from pydantic import BaseModel, Field, field_validator, HttpUrl
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, HttpUrl
 from typing import Optional, Any, Literal
 from datetime import datetime
 from enum import Enum
@@ -32,12 +32,23 @@ class WorkPayload(BaseModel):
     data: str = Field(..., min_length=1, max_length=10000, description="Input data to process")
     iterations: int = Field(default=1000, ge=1, le=1000000, description="Work iterations (affects compute time)")
     
+    # UTF-8 encoding of data, computed once at construction
+    _data_bytes: bytes = PrivateAttr(default=b"")
+    
     @field_validator('data')
     @classmethod
     def data_not_empty(cls, v: str) -> str:
         if not v.strip():
             raise ValueError('data cannot be empty or whitespace only')
         return v
+    
+    def model_post_init(self, __context: Any) -> None:
+        self._data_bytes = self.data.encode()
+    
+    @property
+    def data_bytes(self) -> bytes:
+        """data as UTF-8 bytes (encoded once per payload)."""
+        return self._data_bytes
 
 
 class AsyncWorkPayload(WorkPayload):
@@ -7,26 +7,38 @@ This server:
 3. Provides endpoints to query received callbacks
 """
 import asyncio
+import logging
+import os
+import queue
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timezone
+from itertools import islice
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 import uvicorn
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Callback Receiver", description="Mock server to receive async callbacks")
 
-# Storage for received callbacks
-callbacks_received: list[dict] = []
+# Storage for received callbacks - a ring buffer of the most recent ones
+MAX_STORED_CALLBACKS = 100_000
+callbacks_received: deque[dict] = deque(maxlen=MAX_STORED_CALLBACKS)
+total_received = 0  # Lifetime count, including callbacks evicted from the ring
+_unique_ids: set[str] = set()  # Lifetime distinct request_ids
 callback_times: dict[str, float] = {}  # request_id -> receive timestamp
+callbacks_by_id: dict[str, dict] = {}  # request_id -> newest stored callback
 
 
 @app.post("/callback")
 async def receive_callback(request: Request):
     """Receive callback from async API."""
+    global total_received
     receive_time = time.perf_counter()
     
     try:
@@ -37,14 +49,26 @@ async def receive_callback(request: Request):
     request_id = data.get("request_id", "unknown")
     
     # Store callback
-    callbacks_received.append({
-        "received_at": datetime.utcnow().isoformat(),
+    entry = {
+        "received_at_ns": time.time_ns(),  # Formatted only when served
         "request_id": request_id,
         "data": data
-    })
+    }
+    if len(callbacks_received) == MAX_STORED_CALLBACKS:
+        # The append below evicts the oldest entry. Unindex its id only if
+        # no newer callback for the same id is still stored (the index
+        # always points at the newest one)
+        evicted = callbacks_received[0]
+        if callbacks_by_id.get(evicted["request_id"]) is evicted:
+            del callbacks_by_id[evicted["request_id"]]
+            callback_times.pop(evicted["request_id"], None)
+    callbacks_received.append(entry)
+    total_received += 1
+    _unique_ids.add(request_id)
+    callbacks_by_id[request_id] = entry
     callback_times[request_id] = receive_time
     
-    print(f"✅ Received callback for request {request_id}")
+    logger.debug("Received callback for request %s", request_id)
     
     return {"status": "received", "request_id": request_id}
 
@@ -52,28 +76,47 @@ async def receive_callback(request: Request):
 @app.get("/callbacks")
 async def list_callbacks(limit: int = 100):
     """List received callbacks."""
+    # Newest `limit` entries, oldest first, without copying the whole ring
+    recent = [
+        _render(cb) for cb in islice(reversed(callbacks_received), max(limit, 0))
+    ]
+    recent.reverse()
     return {
-        "total": len(callbacks_received),
-        "callbacks": callbacks_received[-limit:]
+        "total": total_received,
+        "stored": len(callbacks_received),
+        "callbacks": recent
     }
 
 
 @app.get("/callbacks/{request_id}")
 async def get_callback(request_id: str):
     """Get a specific callback by request ID."""
-    for cb in callbacks_received:
-        if cb["request_id"] == request_id:
-            return cb
-    return JSONResponse(status_code=404, content={"error": "Not found"})
+    cb = callbacks_by_id.get(request_id)
+    if cb is None:
+        return JSONResponse(status_code=404, content={"error": "Not found"})
+    return _render(cb)
+
+
+def _render(entry: dict) -> dict:
+    """Stored callback entry -> response shape, with an ISO received_at."""
+    received_at = datetime.fromtimestamp(entry["received_at_ns"] / 1e9, tz=timezone.utc)
+    return {
+        "received_at": received_at.isoformat(),
+        "request_id": entry["request_id"],
+        "data": entry["data"]
+    }
 
 
 @app.delete("/callbacks")
 async def clear_callbacks():
     """Clear all stored callbacks."""
-    global callbacks_received, callback_times
+    global total_received
     count = len(callbacks_received)
-    callbacks_received = []
-    callback_times = {}
+    callbacks_received.clear()
+    callback_times.clear()
+    callbacks_by_id.clear()
+    _unique_ids.clear()
+    total_received = 0
     return {"cleared": count}
 
 
@@ -81,13 +124,37 @@ async def clear_callbacks():
 async def get_stats():
     """Get callback statistics."""
     return {
-        "total_received": len(callbacks_received),
-        "unique_requests": len(set(cb["request_id"] for cb in callbacks_received))
+        "total_received": total_received,
+        "stored": len(callbacks_received),
+        "unique_requests": len(_unique_ids)
     }
 
 
+def setup_logging() -> QueueListener:
+    """
+    Route log records through a queue so the stream writes happen on the
+    listener's thread, not the event loop. Set LOG_LEVEL=DEBUG to log
+    every received callback.
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    )
+    root = logging.getLogger()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(os.environ.get("LOG_LEVEL", "INFO").upper())
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
+
+
 if __name__ == "__main__":
     print("🎯 Starting Callback Receiver on port 8001...")
     print("   Callbacks will be received at: http://localhost:8001/callback")
     print("   View received callbacks at: http://localhost:8001/callbacks")
-    uvicorn.run(app, host="0.0.0.0", port=8001, log_level="warning")
+    listener = setup_logging()
+    try:
+        uvicorn.run(app, host="0.0.0.0", port=8001, log_level="warning")
+    finally:
+        listener.stop()
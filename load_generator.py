@@ -8,6 +8,7 @@ This version:
 """
 import argparse
 import asyncio
+from array import array
 import statistics
 import time
 from dataclasses import dataclass, field
@@ -16,7 +17,30 @@ import threading
 import queue
 
 import aiohttp
-from aiohttp import web
+import orjson
+
+try:
+    import uvloop
+except ImportError:  # Optional: faster event loop when installed
+    uvloop = None
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Constant replies of the callback receiver
+_CALLBACK_OK = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Content-Length: 15\r\n"
+    b"\r\n"
+    b'{"status":"ok"}'
+)
+_CALLBACK_BAD_REQUEST = (
+    b"HTTP/1.1 400 Bad Request\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Content-Length: 24\r\n"
+    b"\r\n"
+    b'{"error":"Invalid JSON"}'
+)
 
 
 @dataclass
@@ -25,8 +49,9 @@ class Stats:
     total: int = 0
     success: int = 0
     failed: int = 0
-    latencies_ms: list = field(default_factory=list)
-    callback_times_ms: list = field(default_factory=list)
+    # Compact C doubles rather than a list of float objects
+    latencies_ms: array = field(default_factory=lambda: array("d"))
+    callback_times_ms: array = field(default_factory=lambda: array("d"))
     errors: dict = field(default_factory=dict)
     
     def record_success(self, latency_ms: float):
@@ -43,14 +68,31 @@ class Stats:
     def record_callback(self, time_ms: float):
         self.callback_times_ms.append(time_ms)
     
-    def percentile(self, data: list, p: float) -> float:
-        if not data:
-            return 0.0
+    @staticmethod
+    def _percentiles(sorted_data: list, ps: tuple) -> list[float]:
+        """Percentiles (linear interpolation) from already sorted data."""
+        last = len(sorted_data) - 1
+        values = []
+        for p in ps:
+            k = last * p / 100
+            f = int(k)
+            c = min(f + 1, last)
+            values.append(sorted_data[f] + (k - f) * (sorted_data[c] - sorted_data[f]))
+        return values
+    
+    def _summary_lines(self, title: str, data: array) -> list[str]:
+        """Percentile/min/max/avg lines, all from one sort of data."""
         sorted_data = sorted(data)
-        k = (len(sorted_data) - 1) * p / 100
-        f = int(k)
-        c = min(f + 1, len(sorted_data) - 1)
-        return sorted_data[f] + (k - f) * (sorted_data[c] - sorted_data[f])
+        p50, p95, p99 = self._percentiles(sorted_data, (50, 95, 99))
+        return [
+            f"\n  {title}:",
+            f"    p50:  {p50:>10.2f}",
+            f"    p95:  {p95:>10.2f}",
+            f"    p99:  {p99:>10.2f}",
+            f"    min:  {sorted_data[0]:>10.2f}",
+            f"    max:  {sorted_data[-1]:>10.2f}",
+            f"    avg:  {statistics.fmean(data):>10.2f}",
+        ]
     
     def report(self, title: str) -> str:
         lines = [
@@ -63,26 +105,10 @@ class Stats:
         ]
         
         if self.latencies_ms:
-            lines.extend([
-                f"\n  Response Latency (ms):",
-                f"    p50:  {self.percentile(self.latencies_ms, 50):>10.2f}",
-                f"    p95:  {self.percentile(self.latencies_ms, 95):>10.2f}",
-                f"    p99:  {self.percentile(self.latencies_ms, 99):>10.2f}",
-                f"    min:  {min(self.latencies_ms):>10.2f}",
-                f"    max:  {max(self.latencies_ms):>10.2f}",
-                f"    avg:  {statistics.mean(self.latencies_ms):>10.2f}",
-            ])
+            lines.extend(self._summary_lines("Response Latency (ms)", self.latencies_ms))
         
         if self.callback_times_ms:
-            lines.extend([
-                f"\n  Time-to-Callback (ms):",
-                f"    p50:  {self.percentile(self.callback_times_ms, 50):>10.2f}",
-                f"    p95:  {self.percentile(self.callback_times_ms, 95):>10.2f}",
-                f"    p99:  {self.percentile(self.callback_times_ms, 99):>10.2f}",
-                f"    min:  {min(self.callback_times_ms):>10.2f}",
-                f"    max:  {max(self.callback_times_ms):>10.2f}",
-                f"    avg:  {statistics.mean(self.callback_times_ms):>10.2f}",
-            ])
+            lines.extend(self._summary_lines("Time-to-Callback (ms)", self.callback_times_ms))
             
             # Show callback completion rate
             expected = self.success
@@ -117,72 +143,151 @@ class IntegratedLoadGenerator:
         
         # Tracking
         self.pending: dict[str, float] = {}  # request_id -> send_time
+        self._all_done = asyncio.Event()  # Set when pending drains
         self.stats = Stats()
         self.callback_server_running = False
-        self._runner: Optional[web.AppRunner] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: set[asyncio.StreamWriter] = set()  # Open callback connections
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    async def _ensure_session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session, so requests reuse keep-alive connections."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.concurrency * 2,
+                    ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the shared HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
     
     async def start_callback_server(self):
         """Start the callback receiver."""
-        app = web.Application()
-        app.router.add_post("/callback", self._handle_callback)
-        
-        self._runner = web.AppRunner(app)
-        await self._runner.setup()
-        site = web.TCPSite(self._runner, "0.0.0.0", self.callback_port)
-        await site.start()
+        self._server = await asyncio.start_server(
+            self._serve_callbacks, "0.0.0.0", self.callback_port
+        )
         self.callback_server_running = True
         print(f"   📡 Callback receiver started on port {self.callback_port}")
     
     async def stop_callback_server(self):
         """Stop the callback receiver."""
-        if self._runner:
-            await self._runner.cleanup()
+        if self._server:
+            self._server.close()
+            # The API keeps idle callback connections alive, and since 3.12.1
+            # wait_closed() waits for them - close them from our side first
+            for writer in list(self._connections):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
             self.callback_server_running = False
     
-    async def _handle_callback(self, request: web.Request) -> web.Response:
-        """Handle incoming callback."""
+    async def _serve_callbacks(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter
+    ):
+        """
+        Minimal keep-alive HTTP/1.1 handler for one callback connection.
+        
+        Every request is treated as a callback POST: headers are scanned
+        only for Content-Length/Connection, the body goes straight to
+        orjson, and the reply is a constant - no routing or response objects.
+        """
+        self._connections.add(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                keep_alive = True
+                for line in head.split(b"\r\n")[1:]:
+                    name, _, value = line.partition(b":")
+                    name = name.strip().lower()
+                    if name == b"content-length":
+                        length = int(value)
+                    elif name == b"connection":
+                        keep_alive = value.strip().lower() != b"close"
+                body = await reader.readexactly(length)
+                
+                writer.write(
+                    _CALLBACK_OK if self._handle_callback(body) else _CALLBACK_BAD_REQUEST
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+    
+    def _handle_callback(self, body: bytes) -> bool:
+        """Handle incoming callback body. Returns False if it isn't valid."""
         receive_time = time.perf_counter()
         
         try:
-            data = await request.json()
-            request_id = data.get("request_id")
-            
-            if request_id and request_id in self.pending:
-                elapsed_ms = (receive_time - self.pending[request_id]) * 1000
-                self.stats.record_callback(elapsed_ms)
-                del self.pending[request_id]
-            
-            return web.json_response({"status": "ok"})
-        except Exception as e:
-            return web.json_response({"error": str(e)}, status=400)
+            data = orjson.loads(body)
+            # Single dict operation per callback (lookup and removal)
+            sent_at = self.pending.pop(data.get("request_id"), None)
+        except (orjson.JSONDecodeError, AttributeError, TypeError):
+            return False
+        
+        if sent_at is not None:
+            self.stats.record_callback((receive_time - sent_at) * 1000)
+            if not self.pending:
+                self._all_done.set()
+        return True
+    
+    async def _run_pool(self, num_requests: int, send_request):
+        """
+        Call send_request(i) for i in range(num_requests) from `concurrency`
+        worker tasks. Only the workers' coroutines exist at any time, not one
+        per request; the event loop is single-threaded, so the workers can
+        share one index iterator without a queue or lock.
+        """
+        indices = iter(range(num_requests))
+        
+        async def worker():
+            for i in indices:
+                await send_request(i)
+        
+        await asyncio.gather(*(
+            worker() for _ in range(min(self.concurrency, num_requests))
+        ))
     
     async def run_sync_test(self, num_requests: int) -> Stats:
         """Run sync endpoint load test."""
         stats = Stats()
-        semaphore = asyncio.Semaphore(self.concurrency)
+        session = await self._ensure_session()
+        # Pre-encoded body; only the index and timestamp vary per request
+        body_template = b'{"data":"sync-test-%d-%r","iterations":1000}'
         
         async def send_request(i: int):
-            async with semaphore:
-                payload = {"data": f"sync-test-{i}-{time.time()}", "iterations": 1000}
-                start = time.perf_counter()
-                
-                try:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.post(
-                            f"{self.api_url}/sync",
-                            json=payload,
-                            timeout=aiohttp.ClientTimeout(total=30)
-                        ) as resp:
-                            latency = (time.perf_counter() - start) * 1000
-                            if resp.status == 200:
-                                stats.record_success(latency)
-                            else:
-                                stats.record_failure(f"HTTP {resp.status}")
-                except Exception as e:
-                    stats.record_failure(str(e)[:50])
+            body = body_template % (i, time.time())
+            start = time.perf_counter()
+            
+            try:
+                async with session.post(
+                    f"{self.api_url}/sync",
+                    data=body,
+                    headers=JSON_HEADERS
+                ) as resp:
+                    latency = (time.perf_counter() - start) * 1000
+                    if resp.status == 200:
+                        stats.record_success(latency)
+                    else:
+                        stats.record_failure(f"HTTP {resp.status}")
+            except Exception as e:
+                stats.record_failure(str(e)[:50])
         
-        tasks = [send_request(i) for i in range(num_requests)]
-        await asyncio.gather(*tasks)
+        await self._run_pool(num_requests, send_request)
         
         return stats
     
@@ -195,58 +300,65 @@ class IntegratedLoadGenerator:
         await self.start_callback_server()
         
         try:
-            semaphore = asyncio.Semaphore(self.concurrency)
+            session = await self._ensure_session()
+            body_template = (
+                b'{"data":"async-test-%d-%r","iterations":1000,"callback_url":'
+                + orjson.dumps(self.callback_url).replace(b"%", b"%%")
+                + b"}"
+            )
             
             async def send_request(i: int):
-                async with semaphore:
-                    payload = {
-                        "data": f"async-test-{i}-{time.time()}",
-                        "iterations": 1000,
-                        "callback_url": self.callback_url
-                    }
-                    start = time.perf_counter()
-                    
-                    try:
-                        async with aiohttp.ClientSession() as session:
-                            async with session.post(
-                                f"{self.api_url}/async",
-                                json=payload,
-                                timeout=aiohttp.ClientTimeout(total=30)
-                            ) as resp:
-                                latency = (time.perf_counter() - start) * 1000
-                                if resp.status == 200:
-                                    data = await resp.json()
-                                    request_id = data.get("request_id")
-                                    if request_id:
-                                        self.pending[request_id] = start
-                                    self.stats.record_success(latency)
-                                else:
-                                    self.stats.record_failure(f"HTTP {resp.status}")
-                    except Exception as e:
-                        self.stats.record_failure(str(e)[:50])
+                body = body_template % (i, time.time())
+                start = time.perf_counter()
+                
+                try:
+                    async with session.post(
+                        f"{self.api_url}/async",
+                        data=body,
+                        headers=JSON_HEADERS
+                    ) as resp:
+                        latency = (time.perf_counter() - start) * 1000
+                        if resp.status == 200:
+                            data = orjson.loads(await resp.read())
+                            request_id = data.get("request_id")
+                            if request_id:
+                                self.pending[request_id] = start
+                            self.stats.record_success(latency)
+                        else:
+                            self.stats.record_failure(f"HTTP {resp.status}")
+                except Exception as e:
+                    self.stats.record_failure(str(e)[:50])
             
             # Send all requests
-            tasks = [send_request(i) for i in range(num_requests)]
-            await asyncio.gather(*tasks)
+            await self._run_pool(num_requests, send_request)
             
             # Wait for callbacks
             print(f"\n   ⏳ Waiting for callbacks...")
-            wait_time = 0
             max_wait = 30  # seconds
-            while len(self.pending) > 0 and wait_time < max_wait:
-                await asyncio.sleep(0.5)
-                wait_time += 0.5
-                remaining = len(self.pending)
-                if wait_time % 5 == 0:
-                    print(f"      {remaining} callbacks pending...")
-            
+            # pending may have drained (and refilled) while sending
             if self.pending:
+                self._all_done.clear()
+            else:
+                self._all_done.set()
+            
+            progress = asyncio.create_task(self._report_pending())
+            try:
+                await asyncio.wait_for(self._all_done.wait(), timeout=max_wait)
+            except asyncio.TimeoutError:
                 print(f"   ⚠️  {len(self.pending)} callbacks not received after {max_wait}s")
+            finally:
+                progress.cancel()
             
         finally:
             await self.stop_callback_server()
         
         return self.stats
+    
+    async def _report_pending(self, interval: float = 5.0):
+        """Print the outstanding callback count periodically."""
+        while True:
+            await asyncio.sleep(interval)
+            print(f"      {len(self.pending)} callbacks pending...")
 
 
 async def main():
@@ -285,18 +397,23 @@ Examples:
         concurrency=args.concurrency
     )
     
-    if args.mode in ("sync", "both"):
-        print("🔄 Running SYNC load test...")
-        stats = await generator.run_sync_test(args.requests)
-        print(stats.report("SYNC ENDPOINT RESULTS"))
-    
-    if args.mode in ("async", "both"):
-        print("🔄 Running ASYNC load test...")
-        stats = await generator.run_async_test(args.requests)
-        print(stats.report("ASYNC ENDPOINT RESULTS"))
+    try:
+        if args.mode in ("sync", "both"):
+            print("🔄 Running SYNC load test...")
+            stats = await generator.run_sync_test(args.requests)
+            print(stats.report("SYNC ENDPOINT RESULTS"))
+        
+        if args.mode in ("async", "both"):
+            print("🔄 Running ASYNC load test...")
+            stats = await generator.run_async_test(args.requests)
+            print(stats.report("ASYNC ENDPOINT RESULTS"))
+    finally:
+        await generator.close()
     
     print("✅ Load test complete!")
 
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(main())